@@ -4,141 +4,332 @@ M3U Playlist Cleaner
 Removes dead/broken links from M3U playlists by testing each stream URL.
 """
 
-import urllib.request
-import urllib.error
-import ssl
+import asyncio
+import aiohttp
+import os
 import socket
-import re
+import sqlite3
 import time
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import argparse
+from collections import defaultdict, deque
+from itertools import islice
+from urllib.parse import urlsplit
+
+# Channels pulled from the parser per scheduling round
+PARSE_BATCH_SIZE = 1000
+
+# Probe results from earlier runs, keyed by stream URL
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'm3u_cleaner.sqlite')
+# Working streams are re-checked sooner than dead ones
+WORKING_CACHE_TTL = 3600
+
+# Seconds a resolved host address is reused across probes
+DNS_CACHE_TTL = 300
+
+# Default ports for streaming schemes probed with a plain TCP connect
+STREAM_PORTS = {'rtmp': 1935, 'rtmps': 443, 'rtsp': 554, 'mms': 1755}
+# Connectionless schemes cannot be probed; their channels are kept
+UNPROBED_SCHEMES = ('udp', 'rtp')
 
 class M3UCleaner:
-    def __init__(self, timeout=10, max_workers=20, verbose=False):
+    def __init__(self, timeout=10, max_workers=500, max_per_host=4, verbose=False,
+                 cache_path=DEFAULT_CACHE_PATH, cache_ttl=6 * 3600):
         self.timeout = timeout
         self.max_workers = max_workers
+        self.max_per_host = max_per_host
         self.verbose = verbose
+        self.cache_ttl = cache_ttl
+        self.cache = None
+        self.dns_cache = {}
         
-        # Create SSL context that doesn't verify certificates (for broken SSL)
-        self.ssl_context = ssl.create_default_context()
-        self.ssl_context.check_hostname = False
-        self.ssl_context.verify_mode = ssl.CERT_NONE
+        if cache_path:
+            try:
+                os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+                self.cache = sqlite3.connect(cache_path)
+                self.cache.execute(
+                    'CREATE TABLE IF NOT EXISTS probe (url TEXT PRIMARY KEY, ts INTEGER, ok INTEGER)'
+                )
+            except (OSError, sqlite3.Error) as e:
+                print(f"Probe cache disabled: {e}")
+                self.cache = None
+        
+    def cached_status(self, url, now):
+        """Return the cached result for url if still fresh, else None"""
+        if self.cache is None:
+            return None
+            
+        try:
+            row = self.cache.execute('SELECT ts, ok FROM probe WHERE url = ?', (url,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading probe cache: {e}")
+            return None
+        if row is None:
+            return None
+            
+        ts, ok = row
+        if ok and now - ts < WORKING_CACHE_TTL:
+            return True
+        if not ok and now - ts < self.cache_ttl:
+            return False
+        return None
+    
+    def save_probe_results(self, results):
+        """Store (url, ts, ok) probe results in the cache"""
+        if self.cache is None or not results:
+            return
+            
+        try:
+            with self.cache:
+                self.cache.executemany('INSERT OR REPLACE INTO probe (url, ts, ok) VALUES (?, ?, ?)', results)
+        except sqlite3.Error as e:
+            print(f"Error updating probe cache: {e}")
         
     def parse_m3u(self, file_path):
-        """Parse M3U file and extract channel info and URLs"""
-        channels = []
+        """Parse M3U file and yield channel info and URLs"""
         current_info = None
         
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
+            f = open(file_path, 'r', encoding='utf-8', errors='ignore')
         except Exception as e:
             print(f"Error reading file: {e}")
-            return []
+            return
             
-        for line in lines:
-            line = line.strip()
+        # Iterate lazily so probing can start before the whole file is read
+        with f:
+            for line in f:
+                line = line.strip()
+                
+                if line.startswith('#EXTINF:'):
+                    current_info = line
+                elif line and not line.startswith('#') and current_info:
+                    # This is a URL line
+                    yield {
+                        'info': current_info,
+                        'url': line
+                    }
+                    current_info = None
+    
+    def interleave_by_host(self, channels):
+        """Yield (host, channel) pairs round-robin across hosts"""
+        buckets = defaultdict(deque)
+        for channel in channels:
+            try:
+                host = urlsplit(channel['url']).netloc
+            except ValueError:
+                host = ''
+            buckets[host].append(channel)
             
-            if line.startswith('#EXTINF:'):
-                current_info = line
-            elif line and not line.startswith('#') and current_info:
-                # This is a URL line
-                channels.append({
-                    'info': current_info,
-                    'url': line
-                })
-                current_info = None
+        # Taking one channel per host in turn spreads load across upstreams
+        # and makes early progress representative of the whole playlist
+        queues = list(buckets.items())
+        while queues:
+            for host, queue in queues:
+                yield host, queue.popleft()
+            queues = [(host, queue) for host, queue in queues if queue]
+    
+    async def resolve(self, host, port):
+        """Resolve host to an IP address, reusing lookups for DNS_CACHE_TTL seconds"""
+        now = time.monotonic()
+        cached = self.dns_cache.get((host, port))
+        if cached is not None and cached[1] > now:
+            return cached[0]
+            
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        address = infos[0][4][0]
+        self.dns_cache[(host, port)] = (address, now + DNS_CACHE_TTL)
+        return address
+    
+    async def test_socket_url(self, url):
+        """Test if a non-HTTP stream URL accepts TCP connections"""
+        try:
+            parts = urlsplit(url)
+            scheme = parts.scheme.lower()
+            if scheme in UNPROBED_SCHEMES:
+                return True
+                
+            host = parts.hostname
+            port = parts.port or STREAM_PORTS.get(scheme)
+            if not host or not port:
+                if self.verbose:
+                    print(f"Unsupported stream URL: {url}")
+                return False
                 
-        return channels
+            # Reachability only: connect and hang up without speaking the protocol
+            address = await asyncio.wait_for(self.resolve(host, port), self.timeout)
+            _, writer = await asyncio.wait_for(asyncio.open_connection(address, port), self.timeout)
+            writer.close()
+            return True
+            
+        except asyncio.TimeoutError:
+            if self.verbose:
+                print(f"Timeout for {url}")
+        except (OSError, ValueError) as e:
+            if self.verbose:
+                print(f"Connection Error for {url}: {e}")
+                
+        return False
     
-    def test_stream_url(self, url):
+    async def test_stream_url(self, session, url):
         """Test if a stream URL is accessible"""
+        if not url.lower().startswith(('http://', 'https://')):
+            return await self.test_socket_url(url)
+            
+        is_playlist = url.endswith('.m3u8') or 'playlist.m3u8' in url
+        
         try:
-            # Create request with headers to mimic a real browser
-            req = urllib.request.Request(url, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': '*/*',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'identity',
-                'Connection': 'keep-alive'
-            })
+            # For plain streams a HEAD is enough and transfers no body.
+            # m3u8 servers often answer HEAD incorrectly, so they skip it.
+            if not is_playlist:
+                async with session.head(url, allow_redirects=True) as response:
+                    if response.status == 200:
+                        return True
+                    if response.status not in (405, 501):
+                        if self.verbose:
+                            print(f"HTTP Error {response.status} for {url}")
+                        return False
             
-            # Open URL with timeout and SSL context
-            with urllib.request.urlopen(req, timeout=self.timeout, context=self.ssl_context) as response:
+            # Fall back to a ranged GET so only the first 1 KiB is sent
+            async with session.get(url, headers={'Range': 'bytes=0-1023'}) as response:
                 # Check if we get a valid response
-                if response.getcode() == 200:
+                if response.status in (200, 206):
+                    # A 206 body is at most 1 KiB; reading it fully lets the
+                    # connection go back to the pool instead of being closed
+                    if response.status == 206:
+                        head = await response.read()
+                    elif is_playlist:
+                        head = await response.content.read(1024)
+                        
                     # For m3u8 files, check if it contains valid playlist data
-                    if url.endswith('.m3u8') or 'playlist.m3u8' in url:
-                        content = response.read(1024).decode('utf-8', errors='ignore')
+                    if is_playlist:
+                        content = head[:1024].decode('utf-8', errors='ignore')
                         if '#EXTM3U' in content or '#EXT-X-' in content or 'http' in content:
                             return True
                     else:
                         # For other streams, just check if we can connect
                         return True
+                elif self.verbose:
+                    print(f"HTTP Error {response.status} for {url}")
                         
-        except urllib.error.HTTPError as e:
-            if self.verbose:
-                print(f"HTTP Error {e.code} for {url}")
-        except urllib.error.URLError as e:
-            if self.verbose:
-                print(f"URL Error for {url}: {e.reason}")
-        except socket.timeout:
+        except asyncio.TimeoutError:
             if self.verbose:
                 print(f"Timeout for {url}")
+        except aiohttp.ClientError as e:
+            if self.verbose:
+                print(f"Client Error for {url}: {e}")
         except Exception as e:
             if self.verbose:
                 print(f"Error for {url}: {e}")
                 
         return False
     
-    def test_channels_batch(self, channels):
-        """Test multiple channels concurrently"""
+    async def test_channels_batch_async(self, channels):
+        """Test multiple channels concurrently on a single event loop"""
         working_channels = []
         dead_channels = []
+        probe_results = []
+        tested = 0
+        now = int(time.time())
+        
+        print(f"Testing channels with up to {self.max_workers} concurrent requests "
+              f"({self.max_per_host} per host)...")
         
-        print(f"Testing {len(channels)} channels with {self.max_workers} workers...")
+        # One semaphore gates all in-flight probes; sockets are multiplexed
+        # by the event loop instead of one thread per request
+        semaphore = asyncio.Semaphore(self.max_workers)
+        # Per-host limit avoids tripping upstream rate limiting, which would
+        # otherwise show up as spurious dead channels
+        host_semaphores = defaultdict(lambda: asyncio.Semaphore(self.max_per_host))
+        # Idle keep-alive sockets are reused for later probes to the same
+        # host, skipping a fresh TCP/TLS handshake per channel; resolved
+        # addresses are kept long enough to cover the whole run
+        connector = aiohttp.TCPConnector(
+            limit=self.max_workers,
+            ssl=False,
+            keepalive_timeout=30,
+            ttl_dns_cache=DNS_CACHE_TTL
+        )
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        headers = {
+            # Mimic a real browser
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Accept': '*/*',
+            'Accept-Language': 'en-US,en;q=0.9',
+            'Accept-Encoding': 'identity'
+        }
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Submit all tasks
-            future_to_channel = {
-                executor.submit(self.test_stream_url, channel['url']): channel 
-                for channel in channels
-            }
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
             
-            # Process completed tasks
-            for i, future in enumerate(as_completed(future_to_channel), 1):
-                channel = future_to_channel[future]
+            async def bounded(host, channel):
+                nonlocal tested
                 
+                cached = False
                 try:
-                    is_working = future.result()
-                    if is_working:
-                        working_channels.append(channel)
-                        status = "✓ WORKING"
-                    else:
-                        dead_channels.append(channel)
-                        status = "✗ DEAD"
-                        
-                    # Extract channel name from EXTINF line
-                    name_match = re.search(r',([^,]+)$', channel['info'])
-                    channel_name = name_match.group(1).strip() if name_match else "Unknown"
-                    
-                    print(f"[{i}/{len(channels)}] {status}: {channel_name}")
+                    # Skip the network entirely for recently checked URLs
+                    is_working = self.cached_status(channel['url'], now)
+                    cached = is_working is not None
                     
+                    if not cached:
+                        # Take the host slot first so a task queued behind a busy
+                        # host does not hold one of the global slots
+                        async with host_semaphores[host], semaphore:
+                            is_working = await self.test_stream_url(session, channel['url'])
+                        probe_results.append((channel['url'], int(time.time()), int(is_working)))
                 except Exception as e:
+                    is_working = False
+                    status = f"✗ ERROR: {channel['url']} - {e}"
+                else:
+                    # Extract channel name from EXTINF line
+                    channel_name = channel['info'].rpartition(',')[2].strip() or "Unknown"
+                    status = f"{'✓ WORKING' if is_working else '✗ DEAD'}: {channel_name}"
+                    if cached:
+                        status += " (cached)"
+                    
+                if is_working:
+                    working_channels.append(channel)
+                else:
                     dead_channels.append(channel)
-                    print(f"[{i}/{len(channels)}] ✗ ERROR: {channel['url']} - {e}")
+                    
+                tested += 1
+                print(f"[{tested}] {status}")
+            
+            channels = iter(channels)
+            tasks = []
+            
+            while True:
+                batch = list(islice(channels, PARSE_BATCH_SIZE))
+                if not batch:
+                    break
+                    
+                tasks.extend(
+                    asyncio.create_task(bounded(host, channel))
+                    for host, channel in self.interleave_by_host(batch)
+                )
+                # Let this batch start probing before the next one is parsed
+                await asyncio.sleep(0)
+                
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"Error testing channel: {result}")
+            
+        self.save_probe_results(probe_results)
                     
         return working_channels, dead_channels
     
+    def test_channels_batch(self, channels):
+        """Test multiple channels concurrently"""
+        return asyncio.run(self.test_channels_batch_async(channels))
+    
     def save_cleaned_playlist(self, working_channels, output_file):
         """Save working channels to new M3U file"""
         try:
+            # Build the playlist once and hand it to the file in a single write
+            lines = ["#EXTM3U\n"]
+            lines.extend(f"{channel['info']}\n{channel['url']}\n" for channel in working_channels)
+            
             with open(output_file, 'w', encoding='utf-8') as f:
-                f.write("#EXTM3U\n")
-                for channel in working_channels:
-                    f.write(f"{channel['info']}\n")
-                    f.write(f"{channel['url']}\n")
+                f.write("".join(lines))
                     
             print(f"\nCleaned playlist saved to: {output_file}")
             return True
@@ -155,8 +346,7 @@ class M3UCleaner:
                 f.write(f"# Total dead links: {len(dead_channels)}\n\n")
                 
                 for channel in dead_channels:
-                    name_match = re.search(r',([^,]+)$', channel['info'])
-                    channel_name = name_match.group(1).strip() if name_match else "Unknown"
+                    channel_name = channel['info'].rpartition(',')[2].strip() or "Unknown"
                     f.write(f"# {channel_name}\n")
                     f.write(f"{channel['info']}\n")
                     f.write(f"{channel['url']}\n\n")
@@ -173,7 +363,10 @@ def main():
     parser.add_argument('-o', '--output', help='Output cleaned playlist file (default: cleaned_playlist.m3u)')
     parser.add_argument('-r', '--report', help='Dead links report file (default: dead_links_report.txt)')
     parser.add_argument('-t', '--timeout', type=int, default=10, help='Timeout for testing URLs (default: 10s)')
-    parser.add_argument('-w', '--workers', type=int, default=20, help='Number of concurrent workers (default: 20)')
+    parser.add_argument('-w', '--workers', type=int, default=500, help='Number of concurrent requests (default: 500)')
+    parser.add_argument('--per-host', type=int, default=4, help='Concurrent requests per host (default: 4)')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore and do not update the probe cache')
+    parser.add_argument('--cache-ttl', type=float, default=6, help='Hours to trust a cached dead result (default: 6)')
     parser.add_argument('-v', '--verbose', action='store_true', help='Verbose output')
     
     args = parser.parse_args()
@@ -190,39 +383,41 @@ def main():
     print(f"Output file: {args.output}")
     print(f"Report file: {args.report}")
     print(f"Timeout: {args.timeout}s")
-    print(f"Workers: {args.workers}")
+    print(f"Workers: {args.workers} ({args.per_host} per host)")
+    print(f"Probe cache: {'disabled' if args.no_cache else DEFAULT_CACHE_PATH}")
     print()
     
     # Initialize cleaner
     cleaner = M3UCleaner(
         timeout=args.timeout,
         max_workers=args.workers,
-        verbose=args.verbose
+        max_per_host=args.per_host,
+        verbose=args.verbose,
+        cache_path=None if args.no_cache else DEFAULT_CACHE_PATH,
+        cache_ttl=int(args.cache_ttl * 3600)
     )
     
-    # Parse M3U file
+    # Parse M3U file; channels are streamed into the tester as they are read
     print("Parsing M3U file...")
     channels = cleaner.parse_m3u(args.input_file)
     
-    if not channels:
-        print("No channels found or error parsing file!")
-        return 1
-        
-    print(f"Found {len(channels)} channels to test")
-    print()
-    
     # Test all channels
     start_time = time.time()
     working_channels, dead_channels = cleaner.test_channels_batch(channels)
     end_time = time.time()
     
+    total_channels = len(working_channels) + len(dead_channels)
+    if not total_channels:
+        print("No channels found or error parsing file!")
+        return 1
+    
     # Print summary
     print("\n" + "="*50)
     print("CLEANING SUMMARY")
     print("="*50)
-    print(f"Total channels tested: {len(channels)}")
-    print(f"Working channels: {len(working_channels)} ({len(working_channels)/len(channels)*100:.1f}%)")
-    print(f"Dead channels: {len(dead_channels)} ({len(dead_channels)/len(channels)*100:.1f}%)")
+    print(f"Total channels tested: {total_channels}")
+    print(f"Working channels: {len(working_channels)} ({len(working_channels)/total_channels*100:.1f}%)")
+    print(f"Dead channels: {len(dead_channels)} ({len(dead_channels)/total_channels*100:.1f}%)")
     print(f"Time taken: {end_time - start_time:.1f} seconds")
     print()
     
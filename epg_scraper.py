@@ -4,255 +4,501 @@ EPG (Electronic Program Guide) Scraper for Jellyfin
 Scrapes and processes EPG data from various sources for IPTV integration with Jellyfin.
 """
 
-import requests
+import asyncio
+import aiohttp
 import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta
 import argparse
+import hashlib
+import json
 import sys
 import os
 from urllib.parse import urlparse
-import gzip
+import tempfile
 import time
+import zlib
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from xml.sax.saxutils import quoteattr
+
+try:
+    from lxml import etree as LET
+except ImportError:
+    LET = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Output elements must come from lxml when its xmlfile writer is used
+etree = LET if LET is not None else ET
+
+# Bytes handed to the XML parser per feed() call
+FEED_CHUNK_SIZE = 65536
+
+# Downloaded guides and their ETag/Last-Modified, reused while unchanged
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'jellyfin_epg')
+
+TV_ATTRIBUTES = {
+    'generator-info-name': 'Jellyfin EPG Scraper',
+    'generator-info-url': 'https://github.com/thecroxdevil/jellyfin-setup'
+}
+
+class Channel:
+    """XMLTV channel record"""
+    __slots__ = ('id', 'name', 'icon')
+
+    def __init__(self, id, name=None, icon=None):
+        self.id = id
+        self.name = name
+        self.icon = icon
+
+class Programme:
+    """XMLTV programme record"""
+    __slots__ = ('channel', 'start', 'stop', 'title', 'desc', 'category')
+
+    def __init__(self, channel, start, stop, title='', desc='', category=None):
+        self.channel = channel
+        self.start = start
+        self.stop = stop
+        self.title = title
+        self.desc = desc
+        self.category = category if category is not None else []
 
 class EPGScraper:
-    def __init__(self, timeout=30, verbose=False):
+    def __init__(self, timeout=30, verbose=False, cache_dir=DEFAULT_CACHE_DIR):
         self.timeout = timeout
         self.verbose = verbose
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.cache_dir = cache_dir
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        }
+        
+        if cache_dir:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+            except OSError as e:
+                print(f"EPG cache disabled: {e}")
+                self.cache_dir = None
 
-    def fetch_epg(self, url):
-        """Fetch EPG data from URL"""
+    def cache_paths(self, url):
+        """Return (data, metadata) cache file paths for a source URL"""
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key + '.xml'), os.path.join(self.cache_dir, key + '.json')
+
+    def load_cache_meta(self, url):
+        """Return cached validators for url, or None if nothing usable is cached"""
+        if not self.cache_dir:
+            return None
+            
+        data_path, meta_path = self.cache_paths(url)
         try:
-            if self.verbose:
-                print(f"Fetching EPG from: {url}")
-                
-            response = self.session.get(url, timeout=self.timeout)
-            response.raise_for_status()
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
             
-            content = response.content
+        if meta.get('path') != data_path or not os.path.exists(data_path):
+            return None
+        return meta
+
+    def save_cache_meta(self, url, response):
+        """Record the validators of a fresh download next to the cached file"""
+        data_path, meta_path = self.cache_paths(url)
+        meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'path': data_path
+        }
+        
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def load_checkpoint(self, url, body):
+        """Return the saved first-pass summary of a cached source, or None if stale"""
+        if not self.cache_dir:
+            return None
             
-            # Handle gzipped content
-            if response.headers.get('Content-Encoding') == 'gzip':
-                content = gzip.decompress(content)
-            elif url.endswith('.gz'):
-                content = gzip.decompress(content)
-                
-            return content.decode('utf-8', errors='ignore')
+        path = self.cache_paths(url)[0] + '.channels.json'
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            checkpoint = orjson.loads(data) if orjson is not None else json.loads(data)
+        except (OSError, ValueError):
+            return None
             
-        except Exception as e:
-            print(f"Error fetching EPG: {e}")
+        # Only valid for the exact cached file it was computed from
+        stat = os.fstat(body.fileno())
+        if checkpoint.get('stamp') != [stat.st_size, stat.st_mtime_ns] or 'days' not in checkpoint:
             return None
+            
+        channels = [Channel(sys.intern(ch_id), name, icon) for ch_id, name, icon in checkpoint['channels']]
+        days = {sys.intern(ch_id): buckets for ch_id, buckets in checkpoint['days'].items()}
+        return channels, days
 
-    def parse_xmltv(self, xml_content):
-        """Parse XMLTV format EPG data"""
-        try:
-            root = ET.fromstring(xml_content)
+    def save_checkpoint(self, url, body, channels, days):
+        """Save a source's first-pass summary next to its cached file"""
+        if not self.cache_dir:
+            return
             
-            channels = {}
-            programmes = []
+        stat = os.fstat(body.fileno())
+        checkpoint = {
+            'stamp': [stat.st_size, stat.st_mtime_ns],
+            'channels': [[ch.id, ch.name, ch.icon] for ch in channels],
+            'days': days
+        }
+        
+        path = self.cache_paths(url)[0] + '.channels.json'
+        try:
+            data = orjson.dumps(checkpoint) if orjson is not None else json.dumps(checkpoint).encode('utf-8')
+            with open(path + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(path + '.tmp', path)
+        except (OSError, TypeError) as e:
+            print(f"Error saving EPG checkpoint: {e}")
+
+    def summarize_source(self, url, body):
+        """Return a source's channels and, per channel, its programmes bucketed by start day"""
+        # An unchanged cached guide was already scanned on an earlier run
+        summary = self.load_checkpoint(url, body)
+        if summary is not None:
+            if self.verbose:
+                print(f"Using saved channel map for: {url}")
+            return summary
             
-            # Parse channels
-            for channel in root.findall('channel'):
-                channel_id = channel.get('id')
-                display_name = channel.find('display-name')
-                if display_name is not None:
-                    channels[channel_id] = {
-                        'id': channel_id,
-                        'name': display_name.text,
-                        'icon': None
-                    }
+        # Each channel maps start days (the first 8 characters of the start
+        # key) to [count, first, last], the last two being the time of day of
+        # the earliest and latest start that day; the summary grows with the
+        # channels and days a guide spans, not with its programme count
+        channels = []
+        days = defaultdict(dict)
+        for record in self.iter_xmltv(body):
+            if isinstance(record, Channel):
+                channels.append(record)
+                continue
+                
+            key = (record.start or '')[:14]
+            day, rest = key[:8], key[8:]
+            buckets = days[record.channel]
+            bucket = buckets.get(day)
+            if bucket is None:
+                buckets[day] = [1, rest, rest]
+            else:
+                bucket[0] += 1
+                if rest < bucket[1]:
+                    bucket[1] = rest
+                elif rest > bucket[2]:
+                    bucket[2] = rest
                     
-                    # Get channel icon if available
-                    icon = channel.find('icon')
-                    if icon is not None:
-                        channels[channel_id]['icon'] = icon.get('src')
-            
-            # Parse programmes
-            for programme in root.findall('programme'):
-                prog_data = {
-                    'channel': programme.get('channel'),
-                    'start': programme.get('start'),
-                    'stop': programme.get('stop'),
-                    'title': '',
-                    'desc': '',
-                    'category': []
-                }
+        self.save_checkpoint(url, body, channels, days)
+        return channels, days
+
+    async def fetch_epg_async(self, session, url):
+        """Download EPG data from URL, returning a readable binary file or None"""
+        body = None
+        tmp_path = None
+        
+        try:
+            if self.verbose:
+                print(f"Fetching EPG from: {url}")
                 
-                title = programme.find('title')
-                if title is not None:
-                    prog_data['title'] = title.text or ''
+            # Replay the validators of the cached copy so an unchanged guide
+            # costs a 304 instead of a full download
+            meta = self.load_cache_meta(url)
+            headers = {}
+            if meta:
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
                     
-                desc = programme.find('desc')
-                if desc is not None:
-                    prog_data['desc'] = desc.text or ''
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304 and meta:
+                    if self.verbose:
+                        print(f"EPG unchanged, using cached copy: {url}")
+                    return open(meta['path'], 'rb')
                     
-                # Get categories
-                for category in programme.findall('category'):
-                    if category.text:
-                        prog_data['category'].append(category.text)
-                        
-                programmes.append(prog_data)
+                response.raise_for_status()
                 
-            return channels, programmes
+                if self.cache_dir:
+                    fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+                    body = os.fdopen(fd, 'w+b')
+                else:
+                    body = tempfile.TemporaryFile()
+                    
+                # aiohttp undoes Content-Encoding itself; .gz files served
+                # without that header are still compressed
+                decompressor = None
+                if url.endswith('.gz') and response.headers.get('Content-Encoding') != 'gzip':
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    
+                async for chunk in response.content.iter_chunked(FEED_CHUNK_SIZE):
+                    body.write(decompressor.decompress(chunk) if decompressor else chunk)
+                if decompressor:
+                    body.write(decompressor.flush())
+                    
+                # Swap the finished download into the cache atomically
+                if tmp_path:
+                    body.flush()
+                    os.replace(tmp_path, self.cache_paths(url)[0])
+                    tmp_path = None
+                    self.save_cache_meta(url, response)
+                    
+            body.seek(0)
+            return body
             
-        except ET.ParseError as e:
-            print(f"XML parsing error: {e}")
-            return {}, []
         except Exception as e:
-            print(f"Error parsing XMLTV: {e}")
-            return {}, []
+            print(f"Error fetching EPG from {url}: {e}")
+            if body is not None:
+                body.close()
+            if tmp_path:
+                os.unlink(tmp_path)
+            return None
 
-    def filter_programmes(self, programmes, days_ahead=7):
-        """Filter programmes to only include upcoming shows within specified days"""
-        if not programmes:
-            return []
-            
-        now = datetime.now()
-        end_date = now + timedelta(days=days_ahead)
+    async def fetch_all(self, urls):
+        """Download every EPG source concurrently, one file per URL"""
+        # Large guides take a while to download, so only connect and
+        # per-read stalls are limited, not the total transfer time
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
         
-        filtered = []
-        for prog in programmes:
-            try:
-                # Parse XMLTV datetime format: 20231201120000 +0000
-                start_str = prog['start'][:14]  # Take first 14 characters
-                start_time = datetime.strptime(start_str, '%Y%m%d%H%M%S')
+        async with aiohttp.ClientSession(headers=self.headers, timeout=timeout) as session:
+            return await asyncio.gather(*[self.fetch_epg_async(session, url) for url in urls])
+
+    def iter_xmltv(self, stream):
+        """Yield Channel and Programme records parsed from a binary XMLTV stream"""
+        # Prefer lxml's C parser; each record is released as soon as it has
+        # been read, so no tree and no record list is ever held in memory
+        if LET is not None:
+            context = LET.iterparse(stream, events=('start', 'end'), huge_tree=True)
+        else:
+            context = ET.iterparse(stream, events=('start', 'end'))
+        _, root = next(context)
+        
+        for event, elem in context:
+            if event != 'end':
+                continue
                 
-                if now <= start_time <= end_date:
-                    filtered.append(prog)
+            if elem.tag == 'channel':
+                # Channels without a display name are skipped
+                display_name = elem.find('display-name')
+                if display_name is not None:
+                    icon = elem.find('icon')
+                    yield Channel(
+                        sys.intern(elem.get('id', '')),
+                        display_name.text,
+                        icon.get('src') if icon is not None else None
+                    )
                     
-            except (ValueError, KeyError):
+            elif elem.tag == 'programme':
+                # Interned ids make every programme of a channel share one
+                # string object, and set/dict lookups hit on identity first.
+                # Text is cleaned here, once, as each record is read.
+                yield Programme(
+                    sys.intern(elem.get('channel', '')),
+                    elem.get('start'),
+                    elem.get('stop'),
+                    (elem.findtext('title') or '').strip(),
+                    (elem.findtext('desc') or '').strip(),
+                    [
+                        category.text.strip() for category in elem.findall('category')
+                        if category.text and not category.text.isspace()
+                    ]
+                )
+                
+            else:
                 continue
                 
-        return sorted(filtered, key=lambda x: x['start'])
+            elem.clear()
+            root.clear()
 
-    def clean_epg_data(self, channels, programmes):
-        """Clean and optimize EPG data"""
-        # Remove channels with no programmes
-        active_channels = set(prog['channel'] for prog in programmes)
-        cleaned_channels = {
-            ch_id: ch_data for ch_id, ch_data in channels.items() 
-            if ch_id in active_channels
-        }
+    def time_window(self, days_ahead=7):
+        """Return (start, end) keys bounding upcoming programmes"""
+        # XMLTV timestamps (20231201120000 +0000) are zero-padded, so their
+        # first 14 characters sort the same way as the times they encode
+        now = datetime.now()
+        now_key = now.strftime('%Y%m%d%H%M%S')
+        end_key = (now + timedelta(days=days_ahead)).strftime('%Y%m%d%H%M%S')
+        return now_key, end_key
+
+    def build_channel_element(self, channel):
+        """Build the output <channel> element for a Channel"""
+        channel_elem = etree.Element('channel')
+        channel_elem.set('id', channel.id)
         
-        # Clean programme data
-        cleaned_programmes = []
-        for prog in programmes:
-            if prog['channel'] in cleaned_channels:
-                # Clean title and description
-                prog['title'] = prog['title'].strip()
-                prog['desc'] = prog['desc'].strip()
-                
-                # Remove empty categories
-                prog['category'] = [cat.strip() for cat in prog['category'] if cat.strip()]
-                
-                cleaned_programmes.append(prog)
-                
-        return cleaned_channels, cleaned_programmes
+        display_name = etree.SubElement(channel_elem, 'display-name')
+        display_name.text = channel.name
+        
+        if channel.icon:
+            icon_elem = etree.SubElement(channel_elem, 'icon')
+            icon_elem.set('src', channel.icon)
+            
+        return channel_elem
 
-    def generate_xmltv(self, channels, programmes, output_file):
-        """Generate clean XMLTV file"""
-        try:
-            root = ET.Element('tv')
-            root.set('generator-info-name', 'Jellyfin EPG Scraper')
-            root.set('generator-info-url', 'https://github.com/thecroxdevil/jellyfin-setup')
+    def build_programme_element(self, prog):
+        """Build the output <programme> element for a Programme"""
+        prog_elem = etree.Element('programme')
+        prog_elem.set('channel', prog.channel)
+        prog_elem.set('start', prog.start)
+        prog_elem.set('stop', prog.stop)
+        
+        if prog.title:
+            title_elem = etree.SubElement(prog_elem, 'title')
+            title_elem.text = prog.title
             
-            # Add channels
-            for ch_id, ch_data in channels.items():
-                channel_elem = ET.SubElement(root, 'channel')
-                channel_elem.set('id', ch_id)
-                
-                display_name = ET.SubElement(channel_elem, 'display-name')
-                display_name.text = ch_data['name']
-                
-                if ch_data.get('icon'):
-                    icon_elem = ET.SubElement(channel_elem, 'icon')
-                    icon_elem.set('src', ch_data['icon'])
+        if prog.desc:
+            desc_elem = etree.SubElement(prog_elem, 'desc')
+            desc_elem.text = prog.desc
             
-            # Add programmes
-            for prog in programmes:
-                prog_elem = ET.SubElement(root, 'programme')
-                prog_elem.set('channel', prog['channel'])
-                prog_elem.set('start', prog['start'])
-                prog_elem.set('stop', prog['stop'])
-                
-                if prog['title']:
-                    title_elem = ET.SubElement(prog_elem, 'title')
-                    title_elem.text = prog['title']
+        for category in prog.category:
+            cat_elem = etree.SubElement(prog_elem, 'category')
+            cat_elem.text = category
                 
-                if prog['desc']:
-                    desc_elem = ET.SubElement(prog_elem, 'desc')
-                    desc_elem.text = prog['desc']
-                
-                for category in prog['category']:
-                    cat_elem = ET.SubElement(prog_elem, 'category')
-                    cat_elem.text = category
-            
-            # Write to file
-            tree = ET.ElementTree(root)
-            ET.indent(tree, space="  ", level=0)
-            tree.write(output_file, encoding='utf-8', xml_declaration=True)
-            
-            return True
-            
-        except Exception as e:
-            print(f"Error generating XMLTV file: {e}")
-            return False
+        return prog_elem
+
+    @contextmanager
+    def open_xmltv_writer(self, output_file):
+        """Stream a <tv> document to output_file, yielding a write(element) callable"""
+        # Written compactly: Jellyfin does not need indentation, and skipping
+        # it saves a walk over every element plus the whitespace bytes
+        if LET is not None:
+            with LET.xmlfile(output_file, encoding='utf-8') as xf:
+                xf.write_declaration()
+                with xf.element('tv', TV_ATTRIBUTES):
+                    yield xf.write
+        else:
+            with open(output_file, 'wb') as f:
+                f.write(b"<?xml version='1.0' encoding='utf-8'?>\n")
+                attributes = ''.join(f' {k}={quoteattr(v)}' for k, v in TV_ATTRIBUTES.items())
+                f.write(f'<tv{attributes}>'.encode('utf-8'))
+                yield lambda elem: f.write(ET.tostring(elem, encoding='utf-8'))
+                f.write(b'</tv>')
 
     def process_epg_source(self, url, output_file, days_ahead=7):
         """Process EPG from source URL and save clean version"""
-        print(f"Processing EPG source: {url}")
-        
-        # Fetch EPG data
-        xml_content = self.fetch_epg(url)
-        if not xml_content:
-            return False
+        return self.process_epg_sources([url], output_file, days_ahead)
+
+    def process_epg_sources(self, urls, output_file, days_ahead=7):
+        """Process and merge EPG from several source URLs into one clean file"""
+        for url in urls:
+            print(f"Processing EPG source: {url}")
             
-        # Parse XMLTV data
-        channels, programmes = self.parse_xmltv(xml_content)
-        if not channels or not programmes:
-            print("No valid EPG data found")
-            return False
+        # Channels must be written before programmes, but only channels with
+        # upcoming programmes are kept; each download is stored on disk so it
+        # can be parsed twice without holding it in memory
+        with ExitStack() as stack:
+            # Fetch EPG data; the total wait is the slowest source, not the sum
+            fetched = asyncio.run(self.fetch_all(urls))
+            sources = [(url, stack.enter_context(body)) for url, body in zip(urls, fetched) if body is not None]
+            if not sources:
+                return False
+                
+            now_key, end_key = self.time_window(days_ahead)
+            channels = {}
+            active_channels = set()
+            # A channel takes its programmes from the first source with any
+            # upcoming ones, so overlapping sources do not duplicate schedules
+            # and a stale source cannot hide a fresh one
+            owners = {}
+            programme_count = upcoming_count = 0
             
-        print(f"Found {len(channels)} channels and {len(programmes)} programmes")
-        
-        # Filter programmes
-        filtered_programmes = self.filter_programmes(programmes, days_ahead)
-        print(f"Filtered to {len(filtered_programmes)} upcoming programmes")
-        
-        # Clean data
-        clean_channels, clean_programmes = self.clean_epg_data(channels, filtered_programmes)
-        print(f"Cleaned to {len(clean_channels)} active channels")
-        
-        # Generate output file
-        if self.generate_xmltv(clean_channels, clean_programmes, output_file):
-            print(f"EPG saved to: {output_file}")
-            return True
-        else:
-            return False
+            # First pass: channel metadata and which channels have upcoming
+            # programmes; a malformed source is skipped like a failed download
+            parsed_sources = []
+            for url, body in sources:
+                try:
+                    source_channels, days = self.summarize_source(url, body)
+                except SyntaxError as e:
+                    # ET.ParseError and lxml's XMLSyntaxError both derive from SyntaxError
+                    print(f"XML parsing error in {url}: {e}")
+                    continue
+                    
+                index = len(parsed_sources)
+                parsed_sources.append((url, body))
+                
+                for channel in source_channels:
+                    channels.setdefault(channel.id, channel)
+                    
+                for ch_id, buckets in days.items():
+                    programme_count += sum(bucket[0] for bucket in buckets.values())
+                    # A day has an upcoming programme when its first or last
+                    # start falls in the window; only a window shorter than a
+                    # day can fall between the two, and such a day is kept
+                    # too since the second pass filters programmes exactly
+                    if ch_id not in owners and any(
+                        day + first <= end_key and day + last >= now_key
+                        for day, (_, first, last) in buckets.items()
+                    ):
+                        owners[ch_id] = index
+                        active_channels.add(ch_id)
+            sources = parsed_sources
+                    
+            if not channels or not programme_count:
+                print("No valid EPG data found")
+                return False
+                
+            print(f"Found {len(channels)} channels and {programme_count} programmes")
+            
+            # Remove channels with no upcoming programmes
+            active_channels.intersection_update(channels)
+            print(f"Cleaned to {len(active_channels)} active channels")
+            
+            # Second pass: stream upcoming programmes straight to the output
+            try:
+                with self.open_xmltv_writer(output_file) as write:
+                    for ch_id, channel in channels.items():
+                        if ch_id in active_channels:
+                            write(self.build_channel_element(channel))
+                            
+                    for index, (url, body) in enumerate(sources):
+                        body.seek(0)
+                        for record in self.iter_xmltv(body):
+                            if (isinstance(record, Programme)
+                                    and record.channel in active_channels
+                                    and owners.get(record.channel) == index
+                                    and now_key <= (record.start or '')[:14] <= end_key):
+                                write(self.build_programme_element(record))
+                                upcoming_count += 1
+                                
+            except SyntaxError as e:
+                print(f"XML parsing error: {e}")
+                return False
+            except Exception as e:
+                print(f"Error generating XMLTV file: {e}")
+                return False
+                
+        print(f"Filtered to {upcoming_count} upcoming programmes")
+        print(f"EPG saved to: {output_file}")
+        return True
 
 def main():
     parser = argparse.ArgumentParser(description='EPG Scraper for Jellyfin IPTV')
-    parser.add_argument('url', help='EPG source URL (XMLTV format)')
+    parser.add_argument('urls', nargs='+', metavar='url', help='EPG source URL (XMLTV format); repeat to merge several sources')
     parser.add_argument('-o', '--output', default='jellyfin_epg.xml', help='Output EPG file')
     parser.add_argument('-d', '--days', type=int, default=7, help='Days ahead to include (default: 7)')
     parser.add_argument('-t', '--timeout', type=int, default=30, help='Request timeout (default: 30s)')
+    parser.add_argument('--no-cache', action='store_true', help='Always download sources in full and keep no local copy')
     parser.add_argument('-v', '--verbose', action='store_true', help='Verbose output')
     
     args = parser.parse_args()
     
     print("Jellyfin EPG Scraper")
     print("===================")
-    print(f"Source URL: {args.url}")
+    print(f"Source URLs: {', '.join(args.urls)}")
     print(f"Output file: {args.output}")
     print(f"Days ahead: {args.days}")
     print()
     
-    scraper = EPGScraper(timeout=args.timeout, verbose=args.verbose)
+    scraper = EPGScraper(
+        timeout=args.timeout,
+        verbose=args.verbose,
+        cache_dir=None if args.no_cache else DEFAULT_CACHE_DIR
+    )
     
-    success = scraper.process_epg_source(args.url, args.output, args.days)
+    success = scraper.process_epg_sources(args.urls, args.output, args.days)
     
     if success:
         print("\n✓ EPG processing completed successfully")
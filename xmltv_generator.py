@@ -4,7 +4,6 @@ XMLTV Generator for Jellyfin
 Generate XMLTV-compatible EPG files from multiple sources and formats.
 """
 
-import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta
 import json
 import argparse
@@ -12,17 +11,92 @@ import sys
 import os
 import requests
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
 from urllib.parse import urlparse
+from xml.sax.saxutils import escape
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Programme rows handed to a worker process at a time with --jobs
+SERIALIZE_BATCH_SIZE = 5000
+
+# Bytes buffered before the generated XMLTV file is written to disk
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+# Attribute values also need quotes and whitespace characters escaped
+ATTR_ENTITIES = {'"': '&quot;', '\n': '&#10;', '\r': '&#13;', '\t': '&#9;'}
+
+# The XMLTV schema written here is fixed, so elements are filled in from
+# templates with already-escaped values instead of built as element trees
+_CHANNEL_TMPL = '<channel id="{id}"><display-name>{name}</display-name>{icon}</channel>'
+_ICON_TMPL = '<icon src="{src}"/>'
+_PROG_TMPL = '<programme channel="{ch}" start="{s}" stop="{e}">{t}{d}{cats}</programme>'
+_TITLE_TMPL = '<title>{}</title>'
+_DESC_TMPL = '<desc>{}</desc>'
+_CATEGORY_TMPL = '<category>{}</category>'
+_TV_OPEN = (b"<?xml version='1.0' encoding='utf-8'?>\n"
+            b'<tv generator-info-name="Jellyfin XMLTV Generator" '
+            b'generator-info-url="https://github.com/thecroxdevil/jellyfin-setup">')
+_TV_CLOSE = b'</tv>'
+
+# Accepted input time layouts, told apart by one match:
+#   YYYY-MM-DD HH:MM[:SS] (or with a T), YYYYMMDDHHMMSS, DD/MM/YYYY HH:MM[:SS]
+_TIME_DISPATCH_RE = re.compile(
+    r'(\d{4})-(\d{1,2})-(\d{1,2})[ T](\d{1,2}):(\d{1,2})(?::(\d{1,2}))?'
+    r'|(\d{4})(\d{2})(\d{2})(\d{2})(\d{2})(\d{2})'
+    r'|(\d{1,2})/(\d{1,2})/(\d{4}) (\d{1,2}):(\d{1,2})(?::(\d{1,2}))?'
+)
+
+def _is_xmltv_time(s):
+    """Check for the fixed "YYYYMMDDHHMMSS +ZZZZ" layout without a regex"""
+    return len(s) == 20 and s[14] == ' ' and s[15] in '+-' and s[:14].isdigit() and s[16:].isdigit()
+
+# Matches at the start of any line that is not an XMLTV time
+_BAD_TIME_LINE_RE = re.compile(r'^(?!\d{14} [+-]\d{4}$)', re.MULTILINE)
+
+def _all_xmltv_times(values):
+    """Check a whole column of times with one regex scan"""
+    joined = '\n'.join(values)
+    # A value containing a newline would be split into several lines
+    if joined.count('\n') != len(values) - 1:
+        return False
+    return _BAD_TIME_LINE_RE.search(joined) is None
 
 class XMLTVGenerator:
-    def __init__(self, verbose=False):
+    def __init__(self, verbose=False, jobs=1):
         self.verbose = verbose
+        self.jobs = jobs
         self.channels = {}
-        self.programmes = []
+        # Programmes are kept as parallel columns, one entry per programme,
+        # rather than a dict per programme; each is serialized to its XML
+        # bytes as it is added, and only the fields validation needs are kept
+        self._p_channel = []
+        self._p_start = []
+        self._p_stop = []
+        self._p_xml = []
+        # Raw time string -> parsed datetime; feeds repeat the same boundaries
+        self._time_cache = {}
+        # Raw string -> XML-escaped form, for text and attribute values
+        self._text_cache = {}
+        self._attr_cache = {}
+        self._category_cache = {}
 
-    def log(self, message):
-        """Print message if verbose mode is enabled"""
+    def log(self, message, *args):
+        """Print message if verbose mode is enabled, %-formatting args only then"""
         if self.verbose:
+            if args:
+                message = message % args
             print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}")
 
     def add_channel(self, channel_id, display_name, icon_url=None):
@@ -32,26 +106,77 @@ class XMLTVGenerator:
             'display_name': display_name,
             'icon': icon_url
         }
-        self.log(f"Added channel: {display_name} ({channel_id})")
+        self.log("Added channel: %s (%s)", display_name, channel_id)
 
     def add_programme(self, channel_id, start_time, stop_time, title, description='', category=None):
         """Add a programme to the EPG"""
+        self._p_channel.append(channel_id)
+        self._p_start.append(start_time)
+        self._p_stop.append(stop_time)
+        self._p_xml.append(self.serialize_programme(
+            channel_id, start_time, stop_time, title, description, self.normalize_categories(category)
+        ))
+        self.log("Added programme: %s on %s", title, channel_id)
+
+    def add_programmes(self, programmes):
+        """Add (channel_id, start, stop, title, description, category) rows in bulk"""
+        if self.jobs > 1:
+            return self.add_programmes_parallel(programmes)
+        
+        # A single pass with the appends bound once, so a streamed source is
+        # serialized row by row and never held in full
+        append_channel = self._p_channel.append
+        append_start = self._p_start.append
+        append_stop = self._p_stop.append
+        append_xml = self._p_xml.append
+        serialize = self.serialize_programme
+        normalize = self.normalize_categories
+        
+        count = 0
+        for channel_id, start, stop, title, desc, category in programmes:
+            append_channel(channel_id)
+            append_start(start)
+            append_stop(stop)
+            append_xml(serialize(channel_id, start, stop, title, desc, normalize(category)))
+            count += 1
+        self.log("Added %d programmes", count)
+
+    def add_programmes_parallel(self, programmes):
+        """Add programme rows in bulk, serializing batches in worker processes"""
+        rows = iter(programmes)
+        pending = deque()
+        count = 0
+        
+        # Batches are submitted as they are read and collected in order; only
+        # a few per worker are in flight, so a streamed source stays bounded
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            for batch in iter(lambda: list(islice(rows, SERIALIZE_BATCH_SIZE)), []):
+                for channel_id, start, stop, *_ in batch:
+                    self._p_channel.append(channel_id)
+                    self._p_start.append(start)
+                    self._p_stop.append(stop)
+                count += len(batch)
+                
+                pending.append(executor.submit(_serialize_programmes, batch))
+                if len(pending) >= 2 * self.jobs:
+                    self._p_xml.extend(pending.popleft().result())
+                    
+            while pending:
+                self._p_xml.extend(pending.popleft().result())
+        
+        self.log("Added %d programmes using %d worker processes", count, self.jobs)
+
+    def normalize_categories(self, category):
+        """Return category as a shared tuple of interned, non-empty names"""
         if category is None:
             category = []
         elif isinstance(category, str):
             category = [category]
-
-        programme = {
-            'channel': channel_id,
-            'start': start_time,
-            'stop': stop_time,
-            'title': title,
-            'desc': description,
-            'category': category
-        }
         
-        self.programmes.append(programme)
-        self.log(f"Added programme: {title} on {channel_id}")
+        # The same few category names recur on every programme; intern them
+        # and share one tuple per distinct combination
+        category = tuple(sys.intern(c.strip()) for c in category if c.strip())
+        return self._category_cache.setdefault(category, category)
 
     def format_xmltv_time(self, dt, timezone='+0000'):
         """Format datetime for XMLTV format"""
@@ -61,54 +186,72 @@ class XMLTVGenerator:
 
     def parse_time(self, time_str):
         """Parse various time formats to datetime"""
-        formats = [
-            '%Y-%m-%d %H:%M:%S',
-            '%Y-%m-%dT%H:%M:%S',
-            '%Y-%m-%d %H:%M',
-            '%Y%m%d%H%M%S',
-            '%d/%m/%Y %H:%M:%S',
-            '%d/%m/%Y %H:%M'
-        ]
+        cached = self._time_cache.get(time_str)
+        if cached is not None:
+            return cached
         
-        for fmt in formats:
-            try:
-                return datetime.strptime(time_str.strip(), fmt)
-            except ValueError:
-                continue
+        match = _TIME_DISPATCH_RE.fullmatch(time_str.strip())
+        if match is None:
+            raise ValueError(f"Unable to parse time: {time_str}")
+        
+        # The populated group set tells which layout matched
+        fields = match.groups()
+        if fields[0] is not None:
+            year, month, day, hour, minute, second = fields[0:6]
+        elif fields[6] is not None:
+            year, month, day, hour, minute, second = fields[6:12]
+        else:
+            day, month, year, hour, minute, second = fields[12:18]
         
-        raise ValueError(f"Unable to parse time: {time_str}")
+        try:
+            parsed = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second or 0))
+        except ValueError:
+            raise ValueError(f"Unable to parse time: {time_str}") from None
+        
+        self._time_cache[time_str] = parsed
+        return parsed
+
+    def xmltv_time(self, value):
+        """Return value as an XMLTV time string, parsing it only if needed"""
+        if _is_xmltv_time(value):
+            return value
+        return self.format_xmltv_time(self.parse_time(value))
 
     def load_from_json(self, json_file):
         """Load EPG data from JSON file"""
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Load channels
-            if 'channels' in data:
-                for channel in data['channels']:
+            with open(json_file, 'rb') as f:
+                if ijson is not None:
+                    # Stream records instead of loading the whole document:
+                    # one pass for channels, a second for programmes
+                    channels = list(ijson.items(f, 'channels.item'))
+                    f.seek(0)
+                    programmes = ijson.items(f, 'programmes.item')
+                else:
+                    data = orjson.loads(f.read()) if orjson is not None else json.load(f)
+                    channels = data.get('channels', [])
+                    programmes = data.get('programmes', [])
+                
+                # Load channels
+                for channel in channels:
                     self.add_channel(
                         channel['id'],
                         channel['name'],
                         channel.get('icon')
                     )
+                
+                # Load programmes
+                self.add_programmes(
+                    (prog['channel'],
+                     self.xmltv_time(prog['start']),
+                     self.xmltv_time(prog['stop']),
+                     prog['title'],
+                     prog.get('description', ''),
+                     prog.get('category', []))
+                    for prog in programmes
+                )
             
-            # Load programmes
-            if 'programmes' in data:
-                for prog in data['programmes']:
-                    start_dt = self.parse_time(prog['start'])
-                    stop_dt = self.parse_time(prog['stop'])
-                    
-                    self.add_programme(
-                        prog['channel'],
-                        self.format_xmltv_time(start_dt),
-                        self.format_xmltv_time(stop_dt),
-                        prog['title'],
-                        prog.get('description', ''),
-                        prog.get('category', [])
-                    )
-            
-            self.log(f"Loaded EPG from JSON: {len(self.channels)} channels, {len(self.programmes)} programmes")
+            self.log(f"Loaded EPG from JSON: {len(self.channels)} channels, {len(self._p_channel)} programmes")
             return True
             
         except Exception as e:
@@ -121,29 +264,45 @@ class XMLTVGenerator:
             import csv
             
             with open(csv_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
+                reader = csv.reader(f)
+                header = next(reader, [])
+                programmes = []
+                
+                # Columns are looked up by position instead of building a dict
+                # per row; a missing column points one past the header, and each
+                # row is cut to the header and padded so that slot holds None
+                width = len(header)
+                column = {name: i for i, name in enumerate(header)}
+                id_i, name_i, icon_i, start_i, stop_i, title_i, desc_i, cat_i = (
+                    column.get(name, width) for name in
+                    ('channel_id', 'channel_name', 'icon', 'start', 'stop', 'title', 'description', 'category')
+                )
+                has_programmes = all(k in column for k in ['start', 'stop', 'title'])
                 
                 for row in reader:
-                    channel_id = row.get('channel_id', '')
-                    channel_name = row.get('channel_name', '')
+                    if not row:
+                        continue
+                    row = row[:width] + [None] * (width + 1 - min(len(row), width))
+                    
+                    channel_id = row[id_i] or ''
+                    channel_name = row[name_i] or ''
                     
                     if channel_id and channel_name:
-                        self.add_channel(channel_id, channel_name, row.get('icon'))
+                        self.add_channel(channel_id, channel_name, row[icon_i])
                     
-                    if all(k in row for k in ['start', 'stop', 'title']):
-                        start_dt = self.parse_time(row['start'])
-                        stop_dt = self.parse_time(row['stop'])
-                        
-                        self.add_programme(
+                    if has_programmes:
+                        programmes.append((
                             channel_id,
-                            self.format_xmltv_time(start_dt),
-                            self.format_xmltv_time(stop_dt),
-                            row['title'],
-                            row.get('description', ''),
-                            row.get('category', '').split(',') if row.get('category') else []
-                        )
+                            self.xmltv_time(row[start_i]),
+                            self.xmltv_time(row[stop_i]),
+                            row[title_i],
+                            row[desc_i] or '',
+                            row[cat_i].split(',') if row[cat_i] else []
+                        ))
+                
+                self.add_programmes(programmes)
             
-            self.log(f"Loaded EPG from CSV: {len(self.channels)} channels, {len(self.programmes)} programmes")
+            self.log(f"Loaded EPG from CSV: {len(self.channels)} channels, {len(self._p_channel)} programmes")
             return True
             
         except Exception as e:
@@ -163,38 +322,39 @@ class XMLTVGenerator:
             ('ch5', 'Demo Kids Channel', 'https://example.com/kids.png')
         ]
         
+        # Title pattern and categories by keyword in the channel name
+        demo_kinds = [
+            ('News', 'News Bulletin {}', ['News']),
+            ('Sports', 'Sports Update {}', ['Sports']),
+            ('Movies', 'Movie Title {}', ['Movies', 'Drama']),
+            ('Kids', 'Kids Show {}', ['Kids', 'Educational'])
+        ]
+        
+        # Every channel shares the same hourly slots starting from the current
+        # hour, so each slot boundary is formatted once rather than per programme
+        base_time = datetime.now().replace(minute=0, second=0, microsecond=0)
+        slots = [self.format_xmltv_time(base_time + timedelta(hours=j))
+                 for j in range(num_programmes_per_channel + 1)]
+        
         for i in range(min(num_channels, len(demo_channels))):
             ch_id, ch_name, ch_icon = demo_channels[i]
             self.add_channel(ch_id, ch_name, ch_icon)
             
-            # Generate programmes for this channel
-            current_time = datetime.now()
+            # The channel name is fixed, so classify it once for all its programmes
+            title_fmt, category = next(
+                ((fmt, cats) for keyword, fmt, cats in demo_kinds if keyword in ch_name),
+                ('Programme {}', ['Demo', 'Test'])
+            )
             
+            # Generate programmes for this channel
             for j in range(num_programmes_per_channel):
-                start_time = current_time + timedelta(hours=j)
-                stop_time = start_time + timedelta(hours=1)
-                
-                title = f"Programme {j+1}"
+                title = title_fmt.format(j + 1)
                 description = f"Demo programme {j+1} on {ch_name}"
-                category = ['Demo', 'Test']
-                
-                if 'News' in ch_name:
-                    title = f"News Bulletin {j+1}"
-                    category = ['News']
-                elif 'Sports' in ch_name:
-                    title = f"Sports Update {j+1}"
-                    category = ['Sports']
-                elif 'Movies' in ch_name:
-                    title = f"Movie Title {j+1}"
-                    category = ['Movies', 'Drama']
-                elif 'Kids' in ch_name:
-                    title = f"Kids Show {j+1}"
-                    category = ['Kids', 'Educational']
                 
                 self.add_programme(
                     ch_id,
-                    self.format_xmltv_time(start_time),
-                    self.format_xmltv_time(stop_time),
+                    slots[j],
+                    slots[j + 1],
                     title,
                     description,
                     category
@@ -205,23 +365,25 @@ class XMLTVGenerator:
         errors = []
         
         # Check for programmes without corresponding channels
-        programme_channels = set(prog['channel'] for prog in self.programmes)
+        programme_channels = set(self._p_channel)
         channel_ids = set(self.channels.keys())
         
         orphaned_channels = programme_channels - channel_ids
         if orphaned_channels:
             errors.append(f"Programmes reference unknown channels: {orphaned_channels}")
         
-        # Check for time format consistency
-        for i, prog in enumerate(self.programmes):
-            try:
-                # Validate time format
-                if not re.match(r'\d{14} [+-]\d{4}', prog['start']):
-                    errors.append(f"Programme {i}: Invalid start time format: {prog['start']}")
-                if not re.match(r'\d{14} [+-]\d{4}', prog['stop']):
-                    errors.append(f"Programme {i}: Invalid stop time format: {prog['stop']}")
-            except Exception as e:
-                errors.append(f"Programme {i}: Time validation error: {e}")
+        # Check for time format consistency; each column is scanned once and
+        # rows are only visited to report the bad ones
+        if not (_all_xmltv_times(self._p_start) and _all_xmltv_times(self._p_stop)):
+            for i, (start, stop) in enumerate(zip(self._p_start, self._p_stop)):
+                try:
+                    # Validate time format
+                    if not _is_xmltv_time(start):
+                        errors.append(f"Programme {i}: Invalid start time format: {start}")
+                    if not _is_xmltv_time(stop):
+                        errors.append(f"Programme {i}: Invalid stop time format: {stop}")
+                except Exception as e:
+                    errors.append(f"Programme {i}: Time validation error: {e}")
         
         if errors:
             print("EPG Validation Errors:")
@@ -232,6 +394,64 @@ class XMLTVGenerator:
         self.log("EPG data validation passed")
         return True
 
+    def escape_text(self, text):
+        """XML-escape element text, cached since titles and categories repeat"""
+        escaped = self._text_cache.get(text)
+        if escaped is None:
+            escaped = self._text_cache[text] = escape(text)
+        return escaped
+
+    def escape_attr(self, value):
+        """XML-escape an attribute value, cached since channel ids and times repeat"""
+        escaped = self._attr_cache.get(value)
+        if escaped is None:
+            escaped = self._attr_cache[value] = escape(value, ATTR_ENTITIES)
+        return escaped
+
+    def serialize_channel(self, ch_id, ch_data):
+        """Serialize a <channel> element from its template"""
+        icon = _ICON_TMPL.format(src=self.escape_attr(ch_data['icon'])) if ch_data.get('icon') else ''
+        return _CHANNEL_TMPL.format(
+            id=self.escape_attr(ch_id),
+            name=self.escape_text(ch_data['display_name'] or ''),
+            icon=icon
+        ).encode('utf-8')
+
+    def serialize_programme(self, channel_id, start, stop, title, desc, categories):
+        """Serialize a <programme> element from its template"""
+        # Channel ids, times, titles and categories repeat across thousands of
+        # programmes, so their escaped forms come from a cache; descriptions
+        # are mostly unique and are escaped directly
+        return _PROG_TMPL.format(
+            ch=self.escape_attr(channel_id),
+            s=self.escape_attr(start),
+            e=self.escape_attr(stop),
+            t=_TITLE_TMPL.format(self.escape_text(title)) if title else '',
+            d=_DESC_TMPL.format(escape(desc)) if desc else '',
+            cats=''.join(_CATEGORY_TMPL.format(self.escape_text(c)) for c in categories)
+        ).encode('utf-8')
+
+    @contextmanager
+    def open_xmltv_writer(self, output_file):
+        """Stream a <tv> document to output_file, yielding a write(bytes) callable"""
+        # Elements arrive already serialized from the templates, so this only
+        # wraps them; a large buffer turns their many small writes into few syscalls.
+        # The document is moved into place only once complete, so a failure
+        # part way leaves the previous guide untouched
+        tmp_path = output_file + '.tmp'
+        try:
+            with open(tmp_path, 'wb', buffering=OUTPUT_BUFFER_SIZE) as f:
+                f.write(_TV_OPEN)
+                yield f.write
+                f.write(_TV_CLOSE)
+            os.replace(tmp_path, output_file)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
     def generate_xmltv(self, output_file):
         """Generate XMLTV file"""
         try:
@@ -239,50 +459,18 @@ class XMLTVGenerator:
             if not self.validate_epg_data():
                 print("EPG data validation failed, generating anyway...")
             
-            root = ET.Element('tv')
-            root.set('generator-info-name', 'Jellyfin XMLTV Generator')
-            root.set('generator-info-url', 'https://github.com/thecroxdevil/jellyfin-setup')
-            
-            # Add channels
-            for ch_id, ch_data in self.channels.items():
-                channel_elem = ET.SubElement(root, 'channel')
-                channel_elem.set('id', ch_id)
+            # Programmes were serialized when they were added, so writing
+            # them is only a matter of copying their bytes out
+            with self.open_xmltv_writer(output_file) as write:
+                for ch_id, ch_data in self.channels.items():
+                    write(self.serialize_channel(ch_id, ch_data))
                 
-                display_name = ET.SubElement(channel_elem, 'display-name')
-                display_name.text = ch_data['display_name']
-                
-                if ch_data.get('icon'):
-                    icon_elem = ET.SubElement(channel_elem, 'icon')
-                    icon_elem.set('src', ch_data['icon'])
-            
-            # Add programmes
-            for prog in self.programmes:
-                prog_elem = ET.SubElement(root, 'programme')
-                prog_elem.set('channel', prog['channel'])
-                prog_elem.set('start', prog['start'])
-                prog_elem.set('stop', prog['stop'])
-                
-                if prog['title']:
-                    title_elem = ET.SubElement(prog_elem, 'title')
-                    title_elem.text = prog['title']
-                
-                if prog['desc']:
-                    desc_elem = ET.SubElement(prog_elem, 'desc')
-                    desc_elem.text = prog['desc']
-                
-                for category in prog['category']:
-                    if category.strip():
-                        cat_elem = ET.SubElement(prog_elem, 'category')
-                        cat_elem.text = category.strip()
-            
-            # Write to file with proper formatting
-            tree = ET.ElementTree(root)
-            ET.indent(tree, space="  ", level=0)
-            tree.write(output_file, encoding='utf-8', xml_declaration=True)
+                for programme_xml in self._p_xml:
+                    write(programme_xml)
             
             self.log(f"XMLTV file generated: {output_file}")
             self.log(f"  - {len(self.channels)} channels")
-            self.log(f"  - {len(self.programmes)} programmes")
+            self.log(f"  - {len(self._p_channel)} programmes")
             
             return True
             
@@ -290,6 +478,20 @@ class XMLTVGenerator:
             print(f"Error generating XMLTV file: {e}")
             return False
 
+# Per-process generator whose escape caches are reused across batches
+_worker_generator = None
+
+def _serialize_programmes(rows):
+    """Serialize a batch of programme rows in a worker process"""
+    global _worker_generator
+    if _worker_generator is None:
+        _worker_generator = XMLTVGenerator()
+    
+    serialize = _worker_generator.serialize_programme
+    normalize = _worker_generator.normalize_categories
+    return [serialize(channel_id, start, stop, title, desc, normalize(category))
+            for channel_id, start, stop, title, desc, category in rows]
+
 def main():
     parser = argparse.ArgumentParser(description='XMLTV Generator for Jellyfin')
     parser.add_argument('-o', '--output', default='generated_epg.xml', help='Output XMLTV file')
@@ -298,6 +500,7 @@ def main():
     parser.add_argument('-d', '--demo', action='store_true', help='Generate demo data')
     parser.add_argument('--demo-channels', type=int, default=5, help='Number of demo channels')
     parser.add_argument('--demo-programmes', type=int, default=10, help='Programmes per channel')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes for serializing loaded programmes')
     parser.add_argument('-v', '--verbose', action='store_true', help='Verbose output')
     
     args = parser.parse_args()
@@ -309,7 +512,7 @@ def main():
     print("Jellyfin XMLTV Generator")
     print("=======================")
     
-    generator = XMLTVGenerator(verbose=args.verbose)
+    generator = XMLTVGenerator(verbose=args.verbose, jobs=args.jobs)
     
     success = True
     